@@ -1,6 +1,29 @@
+import micropython
 import ubluetooth
+import struct
 import time
 
+# Intern UUID objects (and their raw bytes) so repeated use of the same
+# uuid string doesn't re-run the allocating C-level constructor.
+_UUID_CACHE = {}
+_UUID_BYTES_CACHE = {}
+
+
+def _uuid(s):
+    u = _UUID_CACHE.get(s)
+    if u is None:
+        u = ubluetooth.UUID(s)
+        _UUID_CACHE[s] = u
+    return u
+
+
+def _uuid_bytes(s):
+    b = _UUID_BYTES_CACHE.get(s)
+    if b is None:
+        b = bytes(_uuid(s))
+        _UUID_BYTES_CACHE[s] = b
+    return b
+
 
 class Advertising:
     def __init__(self, ble, name):
@@ -8,37 +31,59 @@ class Advertising:
         Handles BLE advertising.
         """
         self.ble = ble
+        self._advertise = ble.gap_advertise  # bound once, used on every (re)start
         self.name = name
         self.service_uuids = []
-        
+        self._service_uuid_bytes = []
+        self._adv_cache = None
+        self._scan_cache = None
+
     def add_service_uuid(self, uuid):
         """
         Add a custom service UUID to the advertisement payload.
         """
-        self.service_uuids.append(ubluetooth.UUID(uuid))
+        self.service_uuids.append(_uuid(uuid))
+        self._service_uuid_bytes.append(_uuid_bytes(uuid))
+        self._adv_cache = None  # payload must be rebuilt on next start()
 
     def _build_adv_payload(self):
         """
-        Build the advertising payload with service UUIDs only.
+        Build (or reuse the cached) advertising payload with service UUIDs only.
         """
-        payload = bytearray()
-        payload += bytearray([2, 0x01, 0x06])  # Flags: General discoverable, BR/EDR not supported
+        if self._adv_cache is not None:
+            return self._adv_cache
+
+        uuid_bytes_list = self._service_uuid_bytes
+        total = 3 + sum(len(b) + 2 for b in uuid_bytes_list)
+        payload = bytearray(total)
+        struct.pack_into("<BBB", payload, 0, 2, 0x01, 0x06)  # Flags: General discoverable, BR/EDR not supported
 
         # Add Service UUIDs (128-bit)
-        for service_uuid in self.service_uuids:
-            uuid_bytes = bytes(service_uuid)
-            payload += bytearray([len(uuid_bytes) + 1, 0x07]) + uuid_bytes
+        offset = 3
+        for uuid_bytes in uuid_bytes_list:
+            n = len(uuid_bytes)
+            payload[offset] = n + 1
+            payload[offset + 1] = 0x07
+            payload[offset + 2:offset + 2 + n] = uuid_bytes
+            offset += n + 2
 
-        return payload
+        self._adv_cache = bytes(payload)
+        return self._adv_cache
 
     def _build_scan_response(self):
         """
-        Build the scan response payload with the device name.
+        Build (or reuse the cached) scan response payload with the device name.
         """
+        if self._scan_cache is not None:
+            return self._scan_cache
+
         name_bytes = self.name.encode("utf-8")
-        payload = bytearray()
-        payload += bytearray([len(name_bytes) + 1, 0x09]) + name_bytes  # Complete Local Name
-        return payload
+        payload = bytearray(2 + len(name_bytes))
+        payload[0] = len(name_bytes) + 1
+        payload[1] = 0x09  # Complete Local Name
+        payload[2:] = name_bytes
+        self._scan_cache = bytes(payload)
+        return self._scan_cache
 
     def start(self, interval=100):
         """
@@ -48,7 +93,7 @@ class Advertising:
         scan_response = self._build_scan_response()
 
         # Start advertising with scan response
-        self.ble.gap_advertise(interval, adv_payload, resp_data=scan_response)
+        self._advertise(interval, adv_payload, resp_data=scan_response)
         print(f"Advertising started with service UUIDs and name '{self.name}' in scan response.")
 
 
@@ -56,45 +101,55 @@ class Advertising:
         """
         Stop BLE advertising.
         """
-        self.ble.gap_advertise(None)
+        self._advertise(None)
         print("Advertising stopped")
 
 
-class BLECharacteristic:
-    def __init__(self, uuid, flags, write_callback=None):
-        self.uuid = ubluetooth.UUID(uuid)
-        self.flags = flags
-        self.write_callback = write_callback
-        self.handle = None
-        self.value = b""
-
-    def set_value(self, value):
-        self.value = value
-
-    def get_value(self):
-        return self.value
-
-
 class BLEService:
     def __init__(self, uuid):
-        self.uuid = ubluetooth.UUID(uuid)
-        self.characteristics = []
-
-    def add_characteristic(self, characteristic):
-        self.characteristics.append(characteristic)
+        self.uuid = _uuid(uuid)
+        # Characteristics live in parallel lists (SoA) instead of one
+        # object each: less per-characteristic heap overhead, char_defs
+        # falls out of a single zip, and IRQ dispatch indexes a list.
+        self.uuids = []
+        self.uuid_strs = []
+        self.flags = []
+        self.callbacks = []
+        self.handles = []
+        self.values = []
+
+    def add_characteristic(self, uuid, flags, write_callback=None):
+        self.uuids.append(_uuid(uuid))
+        self.uuid_strs.append(uuid)
+        self.flags.append(flags)
+        self.callbacks.append(write_callback)
+        self.handles.append(None)
+        self.values.append(b"")
 
 
 class BLEManager:
-    def __init__(self, name="PicoW", tx_power=0):
+    def __init__(self, name="PicoW", tx_power=0, debug=False):
+        self.debug = debug
         self.ble = ubluetooth.BLE()
         self.ble.active(True)
         self.ble.irq(self._irq_handler)
+        # Bind the hot-path methods once; every '.' lookup costs bytecode
+        # in MicroPython and these run per notify / per write IRQ.
+        self._notify = self.ble.gatts_notify
+        self._read_attr = self.ble.gatts_read
+        # Bound once so scheduling it from the IRQ doesn't allocate.
+        self._restart_adv_ref = self._restart_adv
 
         self.advertising = Advertising(self.ble, name)
         self.tx_power = tx_power
         self.services = []
-        self.characteristic_handles = {}  # Map handle -> characteristic
-        self.connections = set()
+        self._pending_services = []  # Services awaiting commit_services()
+        self._pending_defs = []
+        self.characteristic_handles = {}  # Map handle -> (service, index)
+        self._char_by_uuid_str = {}  # Map uuid string -> (service, index)
+        # Tuple of connection handles: rebuilt on the rare (dis)connect
+        # events, iterated allocation-free on every notify.
+        self.connections = ()
         
         self.connect_callback = None
         self.disconnect_callback = None
@@ -120,28 +175,39 @@ class BLEManager:
     def _irq_handler(self, event, data):
         if event == 1:  # _IRQ_CENTRAL_CONNECT
             conn_handle, *_ = data
-            self.connections.add(conn_handle)
-            print(f"Central connected: {conn_handle}")
+            self.connections += (conn_handle,)
+            if self.debug:
+                print(f"Central connected: {conn_handle}")
             if self.connect_callback:
                 self.connect_callback(conn_handle)
 
         elif event == 2:  # _IRQ_CENTRAL_DISCONNECT
             conn_handle, *_ = data
-            self.connections.discard(conn_handle)
-            print(f"Central disconnected: {conn_handle}")
+            self.connections = tuple(h for h in self.connections if h != conn_handle)
+            if self.debug:
+                print(f"Central disconnected: {conn_handle}")
             if self.disconnect_callback:
                 self.disconnect_callback(conn_handle)
-            self.advertising.start()  # Restart advertising
+            # Restart advertising outside the IRQ: gap_advertise is a
+            # blocking HCI command and soft-IRQ handlers must stay short.
+            try:
+                micropython.schedule(self._restart_adv_ref, 0)
+            except RuntimeError:
+                self.advertising.start()  # schedule queue full
 
         elif event == 3:  # _IRQ_GATTS_WRITE
             conn_handle, attr_handle = data
-            #print(f"data rcv:{data}, {event}")
-            value = self.ble.gatts_read(attr_handle)
-            print(value.decode())
-            if attr_handle in self.characteristic_handles:
-                char = self.characteristic_handles[attr_handle]
-                if char.write_callback:
-                    char.write_callback(conn_handle, char, value)
+            # Hand the raw buffer straight to the callback; no decode/print
+            # here, this runs in soft-IRQ context.
+            entry = self.characteristic_handles.get(attr_handle)
+            if entry:
+                service, idx = entry
+                callback = service.callbacks[idx]
+                if callback:
+                    callback(conn_handle, attr_handle, self._read_attr(attr_handle))
+
+    def _restart_adv(self, _):
+        self.advertising.start()
 
     def set_tx_power(self, power):
         """
@@ -153,42 +219,89 @@ class BLEManager:
         except Exception as e:
             print(f"Error setting TX power: {e}")
 
-    def add_service(self, service):
+    def add_service(self, service, defer=True):
         """
-        Add a BLE service.
+        Add a BLE service. Registration is deferred until commit_services()
+        so that all services go into one GATT-table build; pass defer=False
+        to register immediately.
         """
-        char_defs = [(char.uuid, char.flags) for char in service.characteristics]
+        char_defs = list(zip(service.uuids, service.flags))
         self.services.append(service)
+        self._pending_services.append(service)
+        self._pending_defs.append((service.uuid, char_defs))
+        if not defer:
+            self.commit_services()
 
-        # Register the service
-        service_def = (service.uuid, char_defs)
-        handles = self.ble.gatts_register_services([service_def])
-
-        # Assign handles to characteristics
-        for char, handle in zip(service.characteristics, handles[0]):
-            char.handle = handle
-            self.characteristic_handles[handle] = char
-        print(f"Service {service.uuid} added with handles: {handles}")
+    def commit_services(self):
+        """
+        Register all pending services with one gatts_register_services call
+        and assign the returned handles to their characteristics.
+        """
+        if not self._pending_services:
+            return
+        handles = self.ble.gatts_register_services(self._pending_defs)
+        for service, service_handles in zip(self._pending_services, handles):
+            for idx, handle in enumerate(service_handles):
+                service.handles[idx] = handle
+                entry = (service, idx)
+                self.characteristic_handles[handle] = entry
+                uuid_str = service.uuid_strs[idx]
+                self._char_by_uuid_str[uuid_str] = entry
+                self._char_by_uuid_str[uuid_str.lower()] = entry
+            print(f"Service {service.uuid} added with handles: {service_handles}")
+        self._pending_services = []
+        self._pending_defs = []
 
     def notify(self, char_uuid, value):
         """
         Notify all connected centrals of a characteristic value change.
         """
-        for service in self.services:
-            for char in service.characteristics:
-                if char.uuid == ubluetooth.UUID(char_uuid):
-                    char.set_value(value)
-                    for conn_handle in self.connections:
-                        self.ble.gatts_notify(conn_handle, char.handle, value)
-                    print(f"Notification sent for {char_uuid} with value: {value}")
-                    return
-        print(f"Characteristic {char_uuid} not found.")
+        entry = self._char_by_uuid_str.get(char_uuid)
+        if entry is None:
+            print(f"Characteristic {char_uuid} not found.")
+            return
+        service, idx = entry
+        service.values[idx] = value
+        handle = service.handles[idx]
+        notify_fn = self._notify
+        for conn_handle in self.connections:
+            notify_fn(conn_handle, handle, value)
+
+    def get_characteristic(self, uuid_str):
+        """
+        Resolve a characteristic once to its (service, index) reference so
+        hot loops can skip the per-call lookup and use
+        notify_raw/notify_handles.
+        """
+        return self._char_by_uuid_str[uuid_str]
+
+    def notify_raw(self, char, value):
+        """
+        Notify all connected centrals for an already-resolved
+        (service, index) characteristic reference (see get_characteristic);
+        no uuid lookup on this path.
+        """
+        service, idx = char
+        service.values[idx] = value
+        handle = service.handles[idx]
+        notify_fn = self._notify
+        for conn_handle in self.connections:
+            notify_fn(conn_handle, handle, value)
+
+    def notify_handles(self, handle, value, conn_handles=None):
+        """
+        Lowest-level notify: send value for a raw attribute handle to the
+        given connections (default: all current connections).
+        """
+        notify_fn = self._notify
+        for conn_handle in conn_handles if conn_handles is not None else self.connections:
+            notify_fn(conn_handle, handle, value)
 
     def shutdown(self):
         """
         Shut down BLE.
         """
-        self.connections.clear()
+        self.connections = ()
         self.advertising.stop()
         self.ble.active(False)
         print("BLE shut down")
@@ -202,27 +315,24 @@ if __name__ == "__main__":
     service = BLEService(uuid="12345678-1234-5678-1234-56789abcdef0")
 
     # Define characteristics
-    def on_write(conn_handle, char, value):
-        value = value.decode()
-        print(f"Write received on {char.uuid} from connection {conn_handle}. Value: {value}")
+    def on_write(conn_handle, attr_handle, value):
+        value = bytes(value).decode()
+        print(f"Write received on handle {attr_handle} from connection {conn_handle}. Value: {value}")
 
-    char1 = BLECharacteristic(
+    service.add_characteristic(
         uuid="12345678-1234-5678-1234-56789abcdef1",
         flags=ubluetooth.FLAG_READ | ubluetooth.FLAG_WRITE,
         write_callback=on_write,
     )
 
-    char2 = BLECharacteristic(
+    service.add_characteristic(
         uuid="12345678-1234-5678-1234-56789abcdef2",
         flags=ubluetooth.FLAG_READ | ubluetooth.FLAG_NOTIFY,
     )
 
-    # Add characteristics to the service
-    service.add_characteristic(char1)
-    service.add_characteristic(char2)
-
     # Add the service to the BLE manager
     ble_manager.add_service(service)
+    ble_manager.commit_services()
 
     try:
         ble_manager.advertising.start()
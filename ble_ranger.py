@@ -2,7 +2,7 @@
 import ubluetooth
 import struct
 import time
-from ble_base import BLEManager, BLEService, BLECharacteristic
+from ble_base import BLEManager, BLEService
 BLE_RANGER_SERVICE_UUID = "0bfc2787-e220-4b0f-ae98-13731add0000"
 BLE_RANGER_TX_CHAR_UUID = "0bfc2787-e220-4b0f-ae98-13731add0001"
 BLE_RANGER_RX_CHAR_UUID = "0bfc2787-e220-4b0f-ae98-13731add0002"
@@ -14,26 +14,23 @@ class BLERanger:
         service = BLEService(uuid=BLE_RANGER_SERVICE_UUID)
         
         # Define characteristics
-        def on_write(conn_handle, char, value):
-            self.write_handler(value.decode())
-            #print(f"Write received on {char.uuid} from connection {conn_handle}. Value: {value.decode()}")
-            
+        def on_write(conn_handle, attr_handle, value):
+            self.write_handler(value)
+            #print(f"Write received on handle {attr_handle} from connection {conn_handle}. Value: {value}")
 
-        char1 = BLECharacteristic(
+        service.add_characteristic(
             uuid=BLE_RANGER_RX_CHAR_UUID,
             flags=ubluetooth.FLAG_WRITE,
             write_callback=on_write,
         )
 
-        char2 = BLECharacteristic(
+        service.add_characteristic(
             uuid=BLE_RANGER_TX_CHAR_UUID,
             flags=ubluetooth.FLAG_NOTIFY,
         )
-        
-        service.add_characteristic(char1)
-        service.add_characteristic(char2)
         # Add the service to the BLE manager
         self.ble_manager.add_service(service)
+        self.ble_manager.commit_services()
         self.ble_manager.set_advertising_service(BLE_RANGER_SERVICE_UUID)
 
         self.ble_manager.advertising.start()
@@ -42,26 +39,36 @@ class BLERanger:
     
     def write_handler(self, value):
         #print(f"received value: {value}")
-        commands = value.split(";")
-        for command in commands:
-            if(len(command) > 0):
-                channel = None
-                data = None
-                rcv = command.split(":")
+        # Single pass over the raw bytes; no decode and no split() lists.
+        # Channel callbacks receive the data payload as bytes.
+        raw = value.encode() if isinstance(value, str) else bytes(value)
+        get_callback = self.channel_callbacks.get
+        pos = 0
+        n = len(raw)
+        while pos < n:
+            end = raw.find(b";", pos)
+            if end < 0:
+                end = n
+            if end > pos:
+                colon = raw.find(b":", pos, end)
+                if colon < 0:
+                    print("invalid channel type")
+                    break
                 try:
-                    channel = int(rcv[0])
-                    data = rcv[1]
-                except:
+                    channel = int(raw[pos:colon])
+                except ValueError:
                     print("invalid channel type")
                     break
                 try:
-                    if channel in self.channel_callbacks:
-                        self.channel_callbacks[channel](channel, data)
+                    callback = get_callback(channel)
+                    if callback:
+                        callback(channel, raw[colon + 1:end])
                     else:
-                        print(f"unhandled write: {command}")
+                        print(f"unhandled write: {raw[pos:end]}")
                 except Exception as e:
                     print(f"failed to handle data: {e}")
                     break
+            pos = end + 1
     
     def register_disconnect(self, callback):
         self.ble_manager.register_disconnect_callback(callback)
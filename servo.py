@@ -24,39 +24,33 @@ class Servo:
         # Initialize PWM
         if self.platform in ('esp8266', 'esp32'):
             self.pwm = machine.PWM(machine.Pin(pin), freq=freq)
+            duty_max = 1023  # ESP32/ESP8266 uses 10-bit (0-1023)
+            self._set_duty = self.pwm.duty
         elif self.platform == 'rp2':  # Raspberry Pi Pico
             self.pwm = machine.PWM(machine.Pin(pin))
             self.pwm.freq(freq)
+            duty_max = 65535  # Pico uses 16-bit (0-65535)
+            self._set_duty = self.pwm.duty_u16
         else:
             raise RuntimeError("Unsupported platform")
 
+        # Precompute the angle -> duty mapping so per-write math is just
+        # one multiply and one add (20000 us = period at 50 Hz).
+        self._duty_slope = (max_us - min_us) * duty_max / (degrees * 20000)
+        self._duty_bias = min_us * duty_max / 20000
+
     def _angle_to_duty(self, angle):
         """Convert angle (0 to max degrees) into duty cycle."""
-        pulse_width = self.min_us + (angle / self.degrees) * (self.max_us - self.min_us)
-        
-        if self.platform in ('esp8266', 'esp32'):
-            return int(pulse_width * 1023 / 20000)  # ESP32/ESP8266 uses 10-bit (0-1023)
-        elif self.platform == 'rp2':  # Raspberry Pi Pico
-            return int(pulse_width * 65535 / 20000)  # Pico uses 16-bit (0-65535)
-        else:
-            return 0  # Unsupported platform
+        return int(angle * self._duty_slope + self._duty_bias)
 
     def write(self, angle):
         """Move the servo to the specified angle (0 to max degrees)."""
         angle = max(0, min(self.degrees, angle))  # Clamp angle to valid range
-        duty = self._angle_to_duty(angle)
-
-        if self.platform in ('esp8266', 'esp32'):
-            self.pwm.duty(duty)
-        elif self.platform == 'rp2':  # Raspberry Pi Pico
-            self.pwm.duty_u16(duty)
+        self._set_duty(self._angle_to_duty(angle))
 
     def stop(self):
         """Stop the servo (set PWM duty cycle to 0)."""
-        if self.platform in ('esp8266', 'esp32'):
-            self.pwm.duty(0)
-        elif self.platform == 'rp2':  # Raspberry Pi Pico
-            self.pwm.duty_u16(0)
+        self._set_duty(0)
 
     def off(self):
         """Turn off the servo completely (disable PWM)."""
@@ -1,5 +1,6 @@
 from machine import Pin
 from time import ticks_us, ticks_diff, sleep_us
+import micropython
 
 class Stepper:
     # Stepper motor sequence for 28BYJ-48 (half-stepping)
@@ -14,8 +15,13 @@ class Stepper:
         [1, 0, 0, 1]
     ]
 
+    # SEQUENCE packed one nibble per step (bit n = pin n) for the unrolled
+    # per-step pin writes in _advance_sequence.
+    SEQUENCE_BITS = [0b0001, 0b0011, 0b0010, 0b0110, 0b0100, 0b1100, 0b1000, 0b1001]
+
     def __init__(self, pins, steps_per_rev=4096, rpm=8):
         self.pins = [Pin(p, Pin.OUT) for p in pins]
+        self._p0, self._p1, self._p2, self._p3 = self.pins
         self.steps_per_rev = steps_per_rev
         self.rpm = rpm
         self.last_step_time = ticks_us()
@@ -31,6 +37,7 @@ class Stepper:
         self.rpm = rpm
         self._update_min_delay()
 
+    @micropython.native
     def set_pins(self, pattern):
         for pin, value in zip(self.pins, pattern):
             pin.value(value)
@@ -52,12 +59,18 @@ class Stepper:
             return True
         return False
 
+    @micropython.native
     def _advance_sequence(self, direction):
+        # Sequence length is 8, so wrap with a mask instead of modulo.
         if direction > 0:
-            self.current_index = (self.current_index + 1) % len(Stepper.SEQUENCE)
+            self.current_index = (self.current_index + 1) & 7
         else:
-            self.current_index = (self.current_index - 1) % len(Stepper.SEQUENCE)
-        self.set_pins(Stepper.SEQUENCE[self.current_index])
+            self.current_index = (self.current_index - 1) & 7
+        bits = Stepper.SEQUENCE_BITS[self.current_index]
+        self._p0.value(bits & 1)
+        self._p1.value((bits >> 1) & 1)
+        self._p2.value((bits >> 2) & 1)
+        self._p3.value((bits >> 3) & 1)
 
     def disable(self):
         for pin in self.pins:
@@ -2,8 +2,53 @@
 # Works on ESP32/ESP8266/RP2040 etc. using machine.I2C
 
 from machine import I2C
+import array
+import micropython
+import struct
 import time
 
+# RGBC data block layout: C, R, G, B as little-endian uint16
+_RGBC_FMT = "<HHHH"
+
+# Identity white-balance gains in Q8.8, for the no-WB rgb8 path
+_UNITY_GAINS_Q = array.array("H", (256, 256, 256))
+
+
+@micropython.viper
+def _rgbc_to_rgb8(buf: ptr8, gains: ptr16) -> int:
+    """
+    Decode an 8-byte RGBC block and convert to 8-bit RGB with Q8.8
+    white-balance gains, packed as (r8 << 16) | (g8 << 8) | b8.
+    Runs as typed int32 code (viper), no interpreter dispatch per byte.
+    """
+    c = int(buf[0]) | (int(buf[1]) << 8)
+    if c <= 0:
+        return 0
+    r = int(buf[2]) | (int(buf[3]) << 8)
+    g = int(buf[4]) | (int(buf[5]) << 8)
+    b = int(buf[6]) | (int(buf[7]) << 8)
+    half = c >> 1
+    r8 = (r * 255 + half) // c
+    g8 = (g * 255 + half) // c
+    b8 = (b * 255 + half) // c
+    # Clamp before the gain multiply to stay within int32
+    if r8 > 255:
+        r8 = 255
+    if g8 > 255:
+        g8 = 255
+    if b8 > 255:
+        b8 = 255
+    r8 = (r8 * int(gains[0])) >> 8
+    g8 = (g8 * int(gains[1])) >> 8
+    b8 = (b8 * int(gains[2])) >> 8
+    if r8 > 255:
+        r8 = 255
+    if g8 > 255:
+        g8 = 255
+    if b8 > 255:
+        b8 = 255
+    return (r8 << 16) | (g8 << 8) | b8
+
 _DEFAULT_ADDR = 0x29
 
 # Register addresses (with COMMAND bit 0x80 added by writer/reader)
@@ -76,9 +121,15 @@ class TCS34725:
         """
         self.i2c = i2c
         self.addr = addr
+        self._wbuf2 = bytearray(2)  # reusable buffer for 16-bit register writes
+        # Reusable read buffers so the sampling loops don't allocate a
+        # fresh bytes object per I2C transaction.
+        self._scratch1 = bytearray(1)
+        self._scratch8 = bytearray(8)
         self.integration = integration
         self.gain = self._normalize_gain_input(gain)
         self.rgb_gains = (1.0, 1.0, 1.0)
+        self._rgb_gains_q = array.array("H", (256, 256, 256))  # white-balance gains in Q8.8
         self.presence_threshold = None
         self.presence_hysteresis = 0.9  # when present, allow C to drop to 90% of threshold before switching to none
         self._present = False
@@ -104,13 +155,19 @@ class TCS34725:
 
     def _write_u16(self, reg: int, val: int):
         # LSB first
-        self.i2c.writeto_mem(self.addr, _CMD | reg, bytes((val & 0xFF, (val >> 8) & 0xFF)))
+        struct.pack_into("<H", self._wbuf2, 0, val & 0xFFFF)
+        self.i2c.writeto_mem(self.addr, _CMD | reg, self._wbuf2)
 
     def _read_u8(self, reg: int) -> int:
-        return self.i2c.readfrom_mem(self.addr, _CMD | reg, 1)[0]
+        self.i2c.readfrom_mem_into(self.addr, _CMD | reg, self._scratch1)
+        return self._scratch1[0]
 
-    def _read_block(self, reg: int, n: int) -> bytes:
-        return self.i2c.readfrom_mem(self.addr, _CMD | reg, n)
+    def _read_block(self, reg: int, n: int):
+        # Returns a memoryview into the shared scratch buffer; the data is
+        # only valid until the next read.
+        mv = memoryview(self._scratch8)[:n]
+        self.i2c.readfrom_mem_into(self.addr, _CMD | reg, mv)
+        return mv
 
     # ---------- Configuration ----------
 
@@ -144,11 +201,15 @@ class TCS34725:
         if atime not in _ATIME_TO_MS:
             raise ValueError("Unsupported integration time (ATIME 0x%02X)" % atime)
         self.integration = atime
+        # Cache the derived values; they only change here.
+        self._int_ms = _ATIME_TO_MS[atime]
+        self._int_sleep_ms = int(self._int_ms) + 3
         self._write_u8(_REG_ATIME, atime)
 
     def set_gain(self, gain: int):
         g = self._normalize_gain_input(gain)
         self.gain = g
+        self._gain_mult = _GAIN_MULT[g]
         self._write_u8(_REG_CONTROL, g)
 
     def get_gain(self) -> int:
@@ -184,56 +245,58 @@ class TCS34725:
         status = self._read_u8(_REG_STATUS)
         return bool(status & 0x01)
 
+    def _wait_avalid(self):
+        # Poll STATUS for AVALID instead of sleeping a full integration
+        # period; if the sensor already has fresh data we return at once.
+        # Cap the wait at one integration time plus a small margin.
+        deadline = time.ticks_add(time.ticks_ms(), self._int_sleep_ms)
+        while not (self._read_u8(_REG_STATUS) & 0x01):
+            if time.ticks_diff(deadline, time.ticks_ms()) <= 0:
+                break
+            time.sleep_ms(1)
+
     def read_raw(self):
         """
-        Read a full RGBC sample (blocking until one integration period elapsed).
+        Read a full RGBC sample (blocking until data is valid).
         Returns: (c, r, g, b) as 16-bit integers.
         """
-        # Wait at least one full integration period for new data.
-        # Add a small margin (2ms) to be safe.
-        ms = _ATIME_TO_MS[self.integration]
-        time.sleep_ms(int(ms) + 3)
-
-        # Optionally you can poll STATUS for AVALID; we just delay.
+        self._wait_avalid()
         buf = self._read_block(_REG_CDATAL, 8)
-        c = buf[0] | (buf[1] << 8)
-        r = buf[2] | (buf[3] << 8)
-        g = buf[4] | (buf[5] << 8)
-        b = buf[6] | (buf[7] << 8)
+        c, r, g, b = struct.unpack_from(_RGBC_FMT, buf, 0)
         return c, r, g, b
 
-    def read_rgb8(self, apply_white_balance: bool = True):
-        c, r, g, b = self.read_raw()
-        if c <= 0:
-            return 0, 0, 0
-        rn = r / c
-        gn = g / c
-        bn = b / c
-        if apply_white_balance and self.rgb_gains:
-            rg, gg, bg = self.rgb_gains
-            rn *= rg
-            gn *= gg
-            bn *= bg
-        rn = max(0.0, min(1.0, rn))
-        gn = max(0.0, min(1.0, gn))
-        bn = max(0.0, min(1.0, bn))
-        return int(rn * 255 + 0.5), int(gn * 255 + 0.5), int(bn * 255 + 0.5)
+    def read_rgb8(self, apply_white_balance: bool = True, raw=None):
+        if raw is not None:
+            c, r, g, b = raw
+            return self._rgb8_from_raw(c, r, g, b, apply_white_balance)
+        # Fresh sample: decode + convert in one viper call on the raw block.
+        self._wait_avalid()
+        buf = self._read_block(_REG_CDATAL, 8)
+        gains = self._rgb_gains_q if apply_white_balance else _UNITY_GAINS_Q
+        packed = _rgbc_to_rgb8(buf, gains)
+        return (packed >> 16) & 0xFF, (packed >> 8) & 0xFF, packed & 0xFF
 
     def _rgb8_from_raw(self, c: int, r: int, g: int, b: int, apply_white_balance: bool = True):
+        # All-integer path: scale to 8 bits with rounding, apply Q8.8
+        # white-balance gains, clamp. No FP ops per sample.
         if c <= 0:
             return 0, 0, 0
-        rn = r / c
-        gn = g / c
-        bn = b / c
-        if apply_white_balance and self.rgb_gains:
-            rg, gg, bg = self.rgb_gains
-            rn *= rg
-            gn *= gg
-            bn *= bg
-        rn = max(0.0, min(1.0, rn))
-        gn = max(0.0, min(1.0, gn))
-        bn = max(0.0, min(1.0, bn))
-        return int(rn * 255 + 0.5), int(gn * 255 + 0.5), int(bn * 255 + 0.5)
+        half = c >> 1
+        r8 = (r * 255 + half) // c
+        g8 = (g * 255 + half) // c
+        b8 = (b * 255 + half) // c
+        if apply_white_balance:
+            rq, gq, bq = self._rgb_gains_q
+            r8 = (r8 * rq) >> 8
+            g8 = (g8 * gq) >> 8
+            b8 = (b8 * bq) >> 8
+        if r8 > 255:
+            r8 = 255
+        if g8 > 255:
+            g8 = 255
+        if b8 > 255:
+            b8 = 255
+        return r8, g8, b8
 
     # ---------- Convenience computations (approximate) ----------
 
@@ -246,10 +309,10 @@ class TCS34725:
         return max(0,c-c0), max(0,r-r0), max(0,g-g0), max(0,b-b0)
     
     def integration_ms(self) -> float:
-        return _ATIME_TO_MS[self.integration]
+        return self._int_ms
 
     def gain_multiplier(self) -> float:
-        return _GAIN_MULT[self.gain]
+        return self._gain_mult
 
     def _cpl(self, glass_attenuation: float = 1.0) -> float:
         """
@@ -257,38 +320,57 @@ class TCS34725:
         CPL ≈ (integration_ms * gain) / (60 * GA)
         60 is a common normalization constant from app notes; GA is glass attenuation.
         """
-        return (self.integration_ms() * self.gain_multiplier()) / (60.0 * glass_attenuation)
+        return (self._int_ms * self._gain_mult) / (60.0 * glass_attenuation)
 
-    def lux(self, glass_attenuation: float = 1.0) -> float:
+    def lux(self, glass_attenuation: float = 1.0, raw=None) -> float:
         """
         Approximate lux based on DN40-style coefficients.
         LUX ≈ (0.136*R + 1.000*G - 0.444*B) / CPL
+        Pass raw=(c, r, g, b) to reuse an existing sample.
         """
-        c, r, g, b = self.read_raw()
+        c, r, g, b = raw if raw is not None else self.read_raw()
         cpl = self._cpl(glass_attenuation)
         if cpl <= 0:
             return 0.0
         # Coefficients are generic; tune for your optical path.
         return max(0.0, (0.136 * r + 1.000 * g - 0.444 * b) / cpl)
 
-    def color_temperature(self) -> int:
+    def color_temperature(self, raw=None) -> int:
         """
         Approximate CCT (Kelvin) using a simple ratio method:
         CCT ≈ 3810 * (B / R) + 1391  (very rough!)
         For better accuracy, implement full IR-comp and CIE xy → CCT mapping with calibration.
+        Pass raw=(c, r, g, b) to reuse an existing sample.
         """
-        _, r, g, b = self.read_raw()
+        _, r, g, b = raw if raw is not None else self.read_raw()
         if r == 0:
             return 0
         cct = int(3810.0 * (b / (r + 1e-9)) + 1391.0)
         return max(0, cct)
 
-    def normalized_rgb(self):
+    def measure(self, glass_attenuation: float = 1.0):
+        """
+        Take one RGBC sample and return everything derived from it as a dict:
+        {"raw", "lux", "cct", "rgb8", "hsv"}.
+        One integration wait instead of one per derived quantity.
+        """
+        raw = self.read_raw()
+        rgb8 = self.read_rgb8(raw=raw)
+        return {
+            "raw": raw,
+            "lux": self.lux(glass_attenuation, raw=raw),
+            "cct": self.color_temperature(raw=raw),
+            "rgb8": rgb8,
+            "hsv": TCS34725.hsv_from_rgb(*rgb8),
+        }
+
+    def normalized_rgb(self, raw=None):
         """
         Return (rn, gn, bn) normalized to clear channel (0..1).
         Guarded to avoid division-by-zero and clip to [0,1].
+        Pass raw=(c, r, g, b) to reuse an existing sample.
         """
-        c, r, g, b = self.read_raw()
+        c, r, g, b = raw if raw is not None else self.read_raw()
         if c == 0:
             return (0.0, 0.0, 0.0)
         rn = min(1.0, r / c)
@@ -300,80 +382,120 @@ class TCS34725:
         if not isinstance(rgb_gains, (list, tuple)) or len(rgb_gains) != 3:
             raise ValueError("rgb_gains must be a 3-tuple")
         self.rgb_gains = (float(rgb_gains[0]), float(rgb_gains[1]), float(rgb_gains[2]))
+        self._rgb_gains_q = array.array("H", (int(g * 256 + 0.5) for g in self.rgb_gains))
+
+    def _nth(self, a, k):
+        # In-place quickselect (Hoare partition): average O(n) and no list
+        # copy, vs O(n log n) + allocation for sorted(). Reorders a.
+        lo = 0
+        hi = len(a) - 1
+        while lo < hi:
+            pivot = a[(lo + hi) >> 1]
+            i = lo
+            j = hi
+            while i <= j:
+                while a[i] < pivot:
+                    i += 1
+                while a[j] > pivot:
+                    j -= 1
+                if i <= j:
+                    a[i], a[j] = a[j], a[i]
+                    i += 1
+                    j -= 1
+            if k <= j:
+                hi = j
+            elif k >= i:
+                lo = i
+            else:
+                break
+        return a[k]
 
     def _median(self, arr):
+        # Note: partially reorders arr (see _nth).
         n = len(arr)
         if n == 0:
             return 0
-        s = sorted(arr)
         m = n // 2
         if n % 2 == 1:
-            return s[m]
-        return (s[m-1] + s[m]) // 2
+            return self._nth(arr, m)
+        return (self._nth(arr, m - 1) + self._nth(arr, m)) // 2
 
     def measure_ambient_clear(self, samples: int = 10, method: str = "mean", percentile: float = 0.8) -> int:
-        vals = []
         n = max(1, samples)
-        for _ in range(n):
-            c, _, _, _ = self.read_raw()
-            vals.append(int(c))
-        if method == "median":
-            return int(self._median(vals))
-        if method == "percentile":
-            if not vals:
-                return 0
+        if method == "median" or method == "percentile":
+            vals = array.array("I", [0] * n)
+            for i in range(n):
+                c, _, _, _ = self.read_raw()
+                vals[i] = c
+            if method == "median":
+                return int(self._median(vals))
             s = sorted(vals)
             p = percentile
             if p < 0.0:
                 p = 0.0
             if p > 1.0:
                 p = 1.0
-            idx = int(p * (len(s) - 1) + 0.5)
+            idx = int(p * (n - 1) + 0.5)
             return int(s[idx])
+        # mean: accumulate directly, no sample list needed
         total = 0
-        for v in vals:
-            total += v
+        for _ in range(n):
+            c, _, _, _ = self.read_raw()
+            total += c
         return total // n
 
 
     def auto_calibrate(self, white_samples: int = 5, target_min: int = 8000, target_max: int = 40000):
+        n = max(1, white_samples)
         best_gain = GAIN_1X
         best_c = -1
+        best_sums = None
         for gsel in (GAIN_1X, GAIN_4X, GAIN_16X, GAIN_60X):
             self.set_gain(gsel)
-            total = 0
+            cs = 0
+            rs = 0
+            gs = 0
+            bs = 0
             saturated = False
-            for _ in range(max(1, white_samples)):
+            for _ in range(n):
                 c, r, g, b = self.read_raw()
                 if c >= 65500:
                     saturated = True
-                total += c
-            avg_c = total // max(1, white_samples)
+                cs += c
+                rs += r
+                gs += g
+                bs += b
+            avg_c = cs // n
             if not saturated and target_min <= avg_c <= target_max:
                 best_gain = gsel
                 best_c = avg_c
+                best_sums = (cs, rs, gs, bs)
                 break
             if not saturated and avg_c > best_c:
                 best_gain = gsel
                 best_c = avg_c
+                best_sums = (cs, rs, gs, bs)
         self.set_gain(best_gain)
-        rs = 0
-        gs = 0
-        bs = 0
-        cs = 0
-        n = max(1, white_samples)
-        for _ in range(n):
-            c, r, g, b = self.read_raw()
-            rs += r
-            gs += g
-            bs += b
-            cs += c
+        if best_sums is None:
+            # All gains saturated; sample once more at the fallback gain.
+            cs = 0
+            rs = 0
+            gs = 0
+            bs = 0
+            for _ in range(n):
+                c, r, g, b = self.read_raw()
+                cs += c
+                rs += r
+                gs += g
+                bs += b
+            best_sums = (cs, rs, gs, bs)
+        cs, rs, gs, bs = best_sums
         rs //= n
         gs //= n
         bs //= n
         cs //= n
         if cs <= 0:
-            self.rgb_gains = (1.0, 1.0, 1.0)
+            self.set_rgb_gains((1.0, 1.0, 1.0))
         else:
             rn = rs / cs
             gn = gs / cs
@@ -382,27 +504,28 @@ class TCS34725:
             rg = avg / rn if rn > 0 else 1.0
             gg = avg / gn if gn > 0 else 1.0
             bg = avg / bn if bn > 0 else 1.0
-            self.rgb_gains = (rg, gg, bg)
+            self.set_rgb_gains((rg, gg, bg))
         self.print_gain()
         return self.gain, self.rgb_gains
 
     @staticmethod
     def hsv_from_rgb(r, g, b):
-        r_ = r / 255.0
-        g_ = g / 255.0
-        b_ = b / 255.0
-        mx = r_ if r_ >= g_ and r_ >= b_ else (g_ if g_ >= b_ else b_)
-        mn = r_ if r_ <= g_ and r_ <= b_ else (g_ if g_ <= b_ else b_)
+        """
+        Integer HSV from 8-bit RGB: h in 0..359 (degrees), s and v in 0..255.
+        All arithmetic stays in ints (no FPU needed on RP2040/ESP8266).
+        """
+        mx = r if r >= g and r >= b else (g if g >= b else b)
+        mn = r if r <= g and r <= b else (g if g <= b else b)
         d = mx - mn
         if d == 0:
-            h = 0.0
-        elif mx == r_:
-            h = (60.0 * ((g_ - b_) / d) + 360.0) % 360.0
-        elif mx == g_:
-            h = 60.0 * ((b_ - r_) / d) + 120.0
+            h = 0
+        elif mx == r:
+            h = (60 * (g - b) // d + 360) % 360
+        elif mx == g:
+            h = 60 * (b - r) // d + 120
         else:
-            h = 60.0 * ((r_ - g_) / d) + 240.0
-        s = 0.0 if mx == 0.0 else d / mx
+            h = 60 * (r - g) // d + 240
+        s = 0 if mx == 0 else (d * 255 + (mx >> 1)) // mx
         v = mx
         return h, s, v
 